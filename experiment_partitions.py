@@ -15,40 +15,65 @@ Then open browser: http://localhost:8089
 Recommended settings: 20 users, spawn rate 5, run time 3 minutes
 """
 
-from locust import HttpUser, task, between, events
+from locust import task, between, events
+from locust.contrib.fasthttp import FastHttpUser
+from gevent.lock import Semaphore
+import gevent
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 import csv
 import os
+import atexit
+import itertools
+from collections import deque
 
 # =============================================================================
 # Global Metrics Tracking
 # =============================================================================
+# Only the most recent job IDs are kept so memory stays flat on long runs
+JOB_ID_HISTORY = 10_000
+
+
 class Metrics:
     def __init__(self):
         self.total_jobs_submitted = 0
         self.successful_submissions = 0
         self.failed_submissions = 0
         self.rate_limited = 0
-        self.start_time = None
+        self.start_time_ns = None  # time.monotonic_ns() at test start
         self.partition_count = 16  
         self.worker_count = 4    
-        self.job_ids = []
+        self.job_ids = deque(maxlen=JOB_ID_HISTORY)
+        self._lock = Semaphore()
         
     def reset(self):
         self.total_jobs_submitted = 0
         self.successful_submissions = 0
         self.failed_submissions = 0
         self.rate_limited = 0
-        self.start_time = time.time()
-        self.job_ids = []
+        self.start_time_ns = time.monotonic_ns()
+        self.job_ids = deque(maxlen=JOB_ID_HISTORY)
+    
+    def get_elapsed_ns(self):
+        if self.start_time_ns is None:
+            return 0
+        return time.monotonic_ns() - self.start_time_ns
     
-    def get_throughput(self):
-        if self.start_time is None:
+    def get_throughput(self, elapsed_ns=None):
+        if self.start_time_ns is None:
             return 0
-        elapsed = time.time() - self.start_time
-        return self.successful_submissions / elapsed if elapsed > 0 else 0
+        if elapsed_ns is None:
+            elapsed_ns = self.get_elapsed_ns()
+        return self.successful_submissions * 1_000_000_000 / max(1, elapsed_ns)
+    
+    def merge(self, total, successful, failed, rate_limited):
+        """Fold a user's local counters into the global totals"""
+        with self._lock:
+            self.total_jobs_submitted += total
+            self.successful_submissions += successful
+            self.failed_submissions += failed
+            self.rate_limited += rate_limited
     
     def get_error_rate(self):
         total = self.successful_submissions + self.failed_submissions
@@ -57,10 +82,192 @@ class Metrics:
 metrics = Metrics()
 
 
+# =============================================================================
+# Results CSV
+# =============================================================================
+CSV_FILE = 'experiment6_partition_scaling_results.csv'
+CSV_HEADER = [
+    'timestamp',
+    'partition_count',
+    'worker_count',
+    'total_submitted',
+    'successful',
+    'failed',
+    'rate_limited',
+    'error_rate_%',
+    'duration_sec',
+    'throughput_jobs_per_sec',
+    'avg_response_time_ms'
+]
+
+# Rows from every test run in this process, written in one pass at exit
+_RESULTS_BUFFER = []
+
+
+@atexit.register
+def _write_results():
+    """Append all buffered result rows to the CSV with a single open/write"""
+    if not _RESULTS_BUFFER:
+        return
+    
+    file_exists = os.path.isfile(CSV_FILE)
+    with open(CSV_FILE, 'a', newline='', buffering=1 << 16) as f:
+        writer = csv.writer(f)
+        
+        # Write header if new file
+        if not file_exists:
+            writer.writerow(CSV_HEADER)
+        writer.writerows(_RESULTS_BUFFER)
+    _RESULTS_BUFFER.clear()
+
+
+# =============================================================================
+# Cached Clock
+# =============================================================================
+# Payload timestamps are only test markers, so the formatted strings are
+# reused until at least a millisecond (monotonic) has passed since the last
+# refresh, instead of being computed on every request.
+_TICK_NS = 1_000_000
+_SCHED_DELTA_S = 10  # a submitted job is scheduled 10s out
+_NOW = {
+    "iso": "",
+    "sched": "",
+    "tick_ns": -_TICK_NS,  # monotonic time of the last refresh
+    "sec": None,           # wall-clock second the prefixes below belong to
+    "iso_sec": "",
+    "sched_sec": ""
+}
+
+
+def _iso_seconds(s):
+    """Format whole epoch seconds as the UTC 'YYYY-MM-DDTHH:MM:SS' prefix"""
+    t = time.gmtime(s)
+    return (
+        f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
+        f"T{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+    )
+
+
+def _refresh_now(tick_ns):
+    s, frac = divmod(time.time_ns(), 1_000_000_000)
+    
+    # The date/time prefix only changes once a second
+    if s != _NOW["sec"]:
+        _NOW["sec"] = s
+        _NOW["iso_sec"] = _iso_seconds(s)
+        _NOW["sched_sec"] = _iso_seconds(s + _SCHED_DELTA_S)
+    
+    micros = f".{frac // 1000:06d}Z"
+    _NOW["iso"] = _NOW["iso_sec"] + micros
+    _NOW["sched"] = _NOW["sched_sec"] + micros
+    _NOW["tick_ns"] = tick_ns
+
+
+# =============================================================================
+# Request Body
+# =============================================================================
+# The job body is serialized once, with placeholders, and split around its
+# three varying fields: the order number and the two timestamps. Requests then
+# only fill an f-string; the encoder never runs on the hot path.
+_SLOT = "@@"
+_COMPACT = (',', ':')
+
+_BODY_PREFIX, _BODY_TIMESTAMP, _BODY_SCHEDULED_AT, _BODY_SUFFIX = json.dumps({
+    "type": "PAYMENT_PROCESS",
+    "payload": json.dumps({
+        "orderId": f"order-{_SLOT}",
+        "amount": 100.0,
+        "timestamp": _SLOT,
+        "testRun": "partition-scaling"
+    }, separators=_COMPACT),
+    "scheduledAt": _SLOT
+}, separators=_COMPACT).split(_SLOT)
+
+
+# =============================================================================
+# Response Handlers
+# =============================================================================
+_ID_KEYS = (b'"id":"', b'"jobId":"')
+
+
+def _extract_id(buf):
+    """Slice the job ID out of a raw JSON response without parsing the whole body"""
+    view = memoryview(buf)
+    for key in _ID_KEYS:
+        start = buf.find(key)
+        if start == -1:
+            continue
+        start += len(key)
+        end = buf.find(b'"', start)
+        if end > start:
+            return str(view[start:end], 'utf-8')
+    return None
+
+
+def _accepted(user, response):
+    """202 Accepted"""
+    user._local_successful += 1
+    user.jobs_submitted += 1
+    
+    # Try to extract job ID
+    if user.capture_ids:
+        job_id = _extract_id(response.content or b"")
+        if job_id:
+            metrics.job_ids.append(job_id)
+    
+    response.success()
+
+
+def _ok(user, response):
+    """200/201 - also acceptable"""
+    user._local_successful += 1
+    user.jobs_submitted += 1
+    response.success()
+
+
+def _rate_limited(user, response):
+    """429 - rate limited"""
+    user._local_rate_limited += 1
+    response.success()  # Expected behavior, not a failure
+
+
+def _server_error(user, response):
+    """5xx - server error"""
+    user._local_failed += 1
+    response.failure(f"Server error {response.status_code}")
+
+
+def _client_error(user, response):
+    """4xx - client error"""
+    user._local_failed += 1
+    response.failure(f"Client error {response.status_code}")
+
+
+def _unexpected(user, response):
+    """Anything else"""
+    user._local_failed += 1
+    response.failure(f"Unexpected status {response.status_code}")
+
+
+# Exact status codes first, then by status class (status_code // 100)
+_STATUS_HANDLERS = {202: _accepted, 200: _ok, 201: _ok, 429: _rate_limited}
+_CLASS_HANDLERS = {5: _server_error, 4: _client_error}
+
+
 # =============================================================================
 # Locust User Class
 # =============================================================================
-class PartitionScalingUser(HttpUser):
+# Number of distinct X-Client-Id values. The API rate-limits per client ID,
+# so this is kept fixed to hold the rate-limit budget constant across
+# partition counts.
+CLIENT_ID_POOL = 10
+_client_counter = itertools.count()
+
+# Order numbers for job payloads; next() touches no shared attribute
+_order_counter = itertools.count()
+
+
+class PartitionScalingUser(FastHttpUser):
     """
     User that submits jobs to test partition scaling.
     
@@ -71,14 +278,71 @@ class PartitionScalingUser(HttpUser):
     # Wait 100-300ms between requests per user
     wait_time = between(0.1, 0.3)
     
+    # One TCP connection per user: FastHttpUser already gives every user its
+    # own session, and a pool of one keeps users and connections 1:1
+    concurrency = 1
+    
+    # Record accepted job IDs in metrics.job_ids; off by default since nothing
+    # reads them. Subclass and set to True when the IDs are needed.
+    capture_ids = False
+    
+    # How often each user folds its local counters into the global metrics
+    flush_interval = 1.0
+    
+    # Users whose counters still need flushing at test stop
+    active_users = set()
+    
     def on_start(self):
         """Called when a simulated user starts"""
-        if metrics.start_time is None:
-            metrics.start_time = time.time()
+        if metrics.start_time_ns is None:
+            metrics.start_time_ns = time.monotonic_ns()
         
-        # Unique client ID for this user
-        self.client_id = f"partition-test-user-{id(self) % 10}"
+        # Client IDs are handed out round-robin over a fixed pool
+        self.client_id = f"partition-test-user-{next(_client_counter) % CLIENT_ID_POOL}"
         self.jobs_submitted = 0
+        
+        # Bound once so each request skips the client attribute lookups
+        self._post = self.client.post
+        
+        # Request headers never change for this user
+        self._headers = {
+            "Content-Type": "application/json",
+            "X-Client-Id": self.client_id
+        }
+        
+        # Per-user counters; only this greenlet writes them on the hot path
+        self._local_total = 0
+        self._local_successful = 0
+        self._local_failed = 0
+        self._local_rate_limited = 0
+        
+        PartitionScalingUser.active_users.add(self)
+        self._flusher = gevent.spawn(self._flush_loop)
+    
+    def on_stop(self):
+        """Called when a simulated user stops"""
+        self._flusher.kill(block=False)
+        self.flush_metrics()
+        PartitionScalingUser.active_users.discard(self)
+    
+    def _flush_loop(self):
+        while True:
+            gevent.sleep(self.flush_interval)
+            self.flush_metrics()
+    
+    def flush_metrics(self):
+        """Add this user's local counters to the global metrics and zero them"""
+        total, successful, failed, rate_limited = (
+            self._local_total,
+            self._local_successful,
+            self._local_failed,
+            self._local_rate_limited
+        )
+        self._local_total = 0
+        self._local_successful = 0
+        self._local_failed = 0
+        self._local_rate_limited = 0
+        metrics.merge(total, successful, failed, rate_limited)
     
     @task
     def submit_job(self):
@@ -89,72 +353,32 @@ class PartitionScalingUser(HttpUser):
         Tracks success/failure for metrics.
         """
         
-        # Create job payload
-        payload = {
-            "type": "PAYMENT_PROCESS",
-            "payload": json.dumps({
-                "orderId": f"order-{metrics.total_jobs_submitted}",
-                "amount": 100.0,
-                "timestamp": datetime.now().isoformat(),
-                "testRun": "partition-scaling"
-            }),
-            "scheduledAt": (datetime.now() + timedelta(seconds=10)).isoformat()
-        }
-        
-        # HTTP headers
-        headers = {
-            "Content-Type": "application/json",
-            "X-Client-Id": self.client_id
-        }
+        # Create job payload (timestamps come from the cached clock)
+        tick_ns = time.monotonic_ns()
+        if tick_ns - _NOW["tick_ns"] >= _TICK_NS:
+            _refresh_now(tick_ns)
+        body = (
+            f"{_BODY_PREFIX}{next(_order_counter)}"
+            f"{_BODY_TIMESTAMP}{_NOW['iso']}"
+            f"{_BODY_SCHEDULED_AT}{_NOW['sched']}{_BODY_SUFFIX}"
+        ).encode()
         
         # Submit job with error handling
-        with self.client.post(
+        with self._post(
             "/api/jobs",
-            json=payload,
-            headers=headers,
-            catch_response=True,
-            name="Submit Job"
+            data=body,
+            headers=self._headers,
+            name="Submit Job",
+            catch_response=True
         ) as response:
             
             # Track the request
-            metrics.total_jobs_submitted += 1
+            self._local_total += 1
             
             # Handle different response codes
-            if response.status_code == 202:  # Accepted
-                metrics.successful_submissions += 1
-                self.jobs_submitted += 1
-                
-                # Try to extract job ID
-                try:
-                    job_data = response.json()
-                    job_id = job_data.get('id') or job_data.get('jobId')
-                    if job_id:
-                        metrics.job_ids.append(job_id)
-                except:
-                    pass
-                
-                response.success()
-                
-            elif response.status_code in [200, 201]:  # Also acceptable
-                metrics.successful_submissions += 1
-                self.jobs_submitted += 1
-                response.success()
-                
-            elif response.status_code == 429:  # Rate limited
-                metrics.rate_limited += 1
-                response.success()  # Expected behavior, not a failure
-                
-            elif response.status_code >= 500:  # Server error
-                metrics.failed_submissions += 1
-                response.failure(f"Server error {response.status_code}")
-                
-            elif response.status_code >= 400:  # Client error
-                metrics.failed_submissions += 1
-                response.failure(f"Client error {response.status_code}")
-                
-            else:
-                metrics.failed_submissions += 1
-                response.failure(f"Unexpected status {response.status_code}")
+            status = response.status_code
+            handler = _STATUS_HANDLERS.get(status) or _CLASS_HANDLERS.get(status // 100, _unexpected)
+            handler(self, response)
 
 
 # =============================================================================
@@ -184,13 +408,18 @@ def on_test_start(environment, **kwargs):
 def on_test_stop(environment, **kwargs):
     """Called when test stops - calculate and save results"""
     
-    if metrics.start_time is None:
+    # Fold in counters of users that have not flushed yet
+    for user in list(PartitionScalingUser.active_users):
+        user.flush_metrics()
+    
+    if metrics.start_time_ns is None:
         print("No test data collected")
         return
     
     # Calculate metrics
-    duration = time.time() - metrics.start_time
-    throughput = metrics.get_throughput()
+    elapsed_ns = metrics.get_elapsed_ns()
+    duration = elapsed_ns / 1_000_000_000
+    throughput = metrics.get_throughput(elapsed_ns)
     error_rate = metrics.get_error_rate()
     
     # Print summary
@@ -211,57 +440,27 @@ def on_test_stop(environment, **kwargs):
     print(f"    Worker Count:       {metrics.worker_count}")
     print(f"{'='*80}\n")
     
-    # Save to CSV
-    csv_file = 'experiment6_partition_scaling_results.csv'
-    file_exists = os.path.isfile(csv_file)
+    # Get average response time from Locust stats
+    avg_response_time = 0
+    if environment.stats.total.num_requests > 0:
+        avg_response_time = environment.stats.total.avg_response_time
     
-    with open(csv_file, 'a', newline='') as f:
-        writer = csv.writer(f)
-        
-        # Write header if new file
-        if not file_exists:
-            writer.writerow([
-                'timestamp',
-                'partition_count',
-                'worker_count',
-                'total_submitted',
-                'successful',
-                'failed',
-                'rate_limited',
-                'error_rate_%',
-                'duration_sec',
-                'throughput_jobs_per_sec',
-                'avg_response_time_ms'
-            ])
-        
-        # Get average response time from Locust stats
-        avg_response_time = 0
-        if environment.stats.total.num_requests > 0:
-            avg_response_time = environment.stats.total.avg_response_time
-        
-        # Write data
-        writer.writerow([
-            datetime.now().isoformat(),
-            metrics.partition_count,
-            metrics.worker_count,
-            metrics.total_jobs_submitted,
-            metrics.successful_submissions,
-            metrics.failed_submissions,
-            metrics.rate_limited,
-            round(error_rate, 2),
-            round(duration, 2),
-            round(throughput, 2),
-            round(avg_response_time, 2)
-        ])
+    # Save to CSV
+    _RESULTS_BUFFER.append((
+        datetime.now().isoformat(),
+        metrics.partition_count,
+        metrics.worker_count,
+        metrics.total_jobs_submitted,
+        metrics.successful_submissions,
+        metrics.failed_submissions,
+        metrics.rate_limited,
+        round(error_rate, 2),
+        round(duration, 2),
+        round(throughput, 2),
+        round(avg_response_time, 2)
+    ))
     
-    print(f"✅ Results saved to {csv_file}\n")
-
-
-@events.request.add_listener
-def on_request(request_type, name, response_time, response_length, exception, **kwargs):
-    """Called on each request - allows real-time monitoring"""
-    # This enables Locust's built-in statistics tracking
-    pass
+    print(f"✅ Results recorded to {CSV_FILE} (written on exit)\n")
 
 
 # =============================================================================